@@ -1,6 +1,5 @@
 # Author: Ivor Simpson, University of Sussex (i.simpson@sussex.ac.uk)
 # Purpose: Simple functions for analysing audio representations
-from tqdm import tqdm
 from sklearn import ensemble, metrics, model_selection
 import umap
 import umap.plot
@@ -13,28 +12,30 @@ def run_random_forest(representations, labels, n_folds=5):
     Apply a random forest classifier to predict the labels given the representations.
     """
 
-    avg_f1 = 0.0
-    avg_accuracy = 0.0
-    # Average F1 score over n_trails runs.
-    for i in tqdm(range(n_folds), desc="Random Forest Run"):
-        # Split data into train and test for random forest.
-        X_train, X_test, y_train, y_test = model_selection.train_test_split(
-            representations, labels, test_size=0.20, stratify=labels
-        )
-
-        # Fit random forest to data and get predictions.
-        rf_clf = ensemble.RandomForestClassifier(n_estimators=100)
-        rf_clf.fit(X_train, y_train)
-        y_pred = rf_clf.predict(X_test)
-
-        # Evaluate classifier's performance.
-        f1 = metrics.f1_score(y_test, y_pred, average="micro")
-        avg_f1 += f1 / n_folds
-
-        accuracy = metrics.accuracy_score(y_test, y_pred)
-        avg_accuracy += accuracy / n_folds
+    # Split data into train and test n_folds times for random forest, keeping the class balance of each split.
+    cv = model_selection.StratifiedShuffleSplit(n_splits=n_folds, test_size=0.20)
+    splits = list(cv.split(representations, labels))
+
+    # Fit random forests to each split, building the trees in parallel across all cores.
+    rf_clf = ensemble.RandomForestClassifier(n_estimators=100, n_jobs=-1)
+    scores = model_selection.cross_validate(
+        rf_clf,
+        representations,
+        labels,
+        cv=splits,
+        scoring=("f1_micro", "accuracy"),
+        return_estimator=True,
+        error_score="raise",
+    )
+
+    # Average F1 and accuracy scores over n_folds runs.
+    avg_f1 = scores["test_f1_micro"].mean()
+    avg_accuracy = scores["test_accuracy"].mean()
 
     # Generate confusion matrix for last run.
+    _, test_idx = splits[-1]
+    y_test = np.asarray(labels)[test_idx]
+    y_pred = scores["estimator"][-1].predict(np.asarray(representations)[test_idx])
     cm = metrics.confusion_matrix(y_test, y_pred, normalize="all")
 
     return avg_f1, avg_accuracy, cm
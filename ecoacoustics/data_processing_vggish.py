@@ -1,14 +1,26 @@
 # Author: Ivor Simpson, University of Sussex (i.simpson@sussex.ac.uk)
 # Purpose: Prepare our data for data processing with VGGish
+import os
 import numpy as np
 import torch
 from conduit.data.datamodules.audio import EcoacousticsDataModule
 import torchaudio.transforms as T
 from tqdm import tqdm
 
-def prepare_data(root_directory, target_attribute):
-    resample_rate = 16_000  # Matching sample rate used by Sethi et al.: https://www.pnas.org/content/117/29/17049.
+# Version of the features produced by prepare_data(), used to key cached representations. Bump it whenever the
+# feature extraction changes so that stale representations are regenerated rather than reused.
+FEATURES_VERSION = 2
+
+
+class TimeMajor(torch.nn.Module):
+    """Transpose a (..., freq, time) spectrogram into a contiguous (..., time, freq) one, as VGGish expects."""
 
+    def forward(self, specgram):
+        return torch.transpose(specgram, -2, -1).contiguous()
+
+
+def make_specgram_transform(resample_rate):
+    """Build the mel spectrogram transform and the segment length (in seconds) that frames into VGGish examples."""
     # Values following those delineated in https://arxiv.org/pdf/1609.09430.pdf.
     window_length_secs = 0.025
     hop_length_secs = 0.01
@@ -17,22 +29,44 @@ def prepare_data(root_directory, target_attribute):
     fft_length = 2 ** int(np.ceil(np.log(window_length_samples) / np.log(2.0)))
     n_freq_bins = 64
 
-    # Define the spectrogram transform we want to apply to the waveform segments.
-    specgram_tform = T.MelSpectrogram(
-        sample_rate=resample_rate,
-        n_mels=n_freq_bins,
-        n_fft=fft_length,
-        win_length=window_length_samples,
-        hop_length=hop_length_samples,
+    # Size each segment so that, without centring, it frames into exactly 60 VGGish examples of 96 frames.
+    # torch.stft cuts frames of fft_length samples (the window is zero-padded up to that), so a segment of
+    # N samples gives 1 + (N - fft_length) // hop_length_samples frames.
+    num_frames = 96 * 60
+    specgram_segment_len = (fft_length + (num_frames - 1) * hop_length_samples) / resample_rate
+
+    # Define the spectrogram transform we want to apply to the waveform segments. Spectrograms are emitted with
+    # time on the vertical axis, so the batches can be split into VGGish examples without another copy.
+    specgram_tform = torch.nn.Sequential(
+        T.MelSpectrogram(
+            sample_rate=resample_rate,
+            n_mels=n_freq_bins,
+            n_fft=fft_length,
+            win_length=window_length_samples,
+            hop_length=hop_length_samples,
+            center=False,
+        ),
+        TimeMajor(),
     )
 
-    # Initialise Conduit datamodule (stores dataloaders).
+    return specgram_tform, specgram_segment_len
+
+
+def prepare_data(root_directory, target_attribute, batch_size=8):
+    resample_rate = 16_000  # Matching sample rate used by Sethi et al.: https://www.pnas.org/content/117/29/17049.
+    specgram_tform, specgram_segment_len = make_specgram_transform(resample_rate)
+
+    # Initialise Conduit datamodule (stores dataloaders). Each sample is split into 60 VGGish examples, so the
+    # default batch of 8 samples gives 480 examples per forward pass, which keeps VGGish's activations well within
+    # the memory of a typical GPU.
     dm = EcoacousticsDataModule(
         root=root_directory,
-        specgram_segment_len=0.96 * 60.0,
+        specgram_segment_len=specgram_segment_len,
         test_prop=0,
         val_prop=0,
-        train_batch_size=1,
+        train_batch_size=batch_size,
+        num_workers=os.cpu_count() or 1,
+        pin_memory=True,
         target_attr=target_attribute,
         preprocessing_transform=specgram_tform,
         resample_rate=resample_rate
@@ -46,6 +80,11 @@ def prepare_data(root_directory, target_attribute):
     return representations, labels
 
 
+def average_sample_representations(rep, batch_size):
+    """Average the VGGish representations of each sample's 60 examples, stacked sample by sample."""
+    return torch.mean(torch.reshape(rep, (batch_size, 60, -1)), 1)
+
+
 def process_vggish(datamodule):
     """Pass data through VGGish to obtain 128 dimensional vector representations of samples."""
 
@@ -70,23 +109,22 @@ def process_vggish(datamodule):
     labels_ls = []
     with torch.no_grad():
         for data in tqdm(data_loader, desc="Generating Representations"):
-            # Crop spectrogram to meet VGGish's expected dimensions.
-            specgram = data.x[:, :, :, :96 * 60]
-
-            # Transpose spectrogram to get time on the vertical axis instead of freq bins.
-            specgram = torch.transpose(specgram, -2, -1)
+            # Move the spectrogram to the device first so the remaining ops run there. Batches are pinned by
+            # the data loader, so the copy can be issued asynchronously.
+            specgram = data.x.to(device, non_blocking=True)
 
-            specgram = torch.reshape(specgram, (60, 1, 96, 64))
+            # Split each sample into 60 VGGish examples, stacking those of the whole batch together.
+            batch_size = specgram.shape[0]
+            specgram = torch.reshape(specgram, (batch_size * 60, 1, 96, 64))
 
-            # VGGish expects log-transformed spectrograms.
-            specgram = torch.log(specgram + 10e-4).to(device)
-            y = data.y.to(device)
+            # VGGish expects log-transformed spectrograms, computed in place to avoid extra temporaries.
+            specgram = specgram.add_(10e-4).log_()
 
             rep = model(specgram)
-            rep = torch.mean(rep, 0, keepdim=True)
+            rep = average_sample_representations(rep, batch_size)
 
             reps_ls.append(rep.cpu().numpy())
-            labels_ls.append(y.cpu().numpy())
+            labels_ls.append(data.y.numpy())
 
     reps = np.concatenate(reps_ls)
     labels = np.concatenate(labels_ls)
@@ -8,7 +8,7 @@
 from pathlib import Path
 import matplotlib.pyplot as plt
 import numpy as np
-from data_processing_vggish import prepare_data
+from data_processing_vggish import FEATURES_VERSION, prepare_data
 from data_analysis import run_random_forest, apply_umap
 
 from sklearn import metrics
@@ -19,7 +19,7 @@ LABEL_NAMES = ['UK1', 'UK2', 'EC1', 'EC3', 'EC2', 'UK3']
 
 def main():
     target_attribute = 'habitat'
-    representations_file = ROOT_DIR / f'representations_{target_attribute}.npz'
+    representations_file = ROOT_DIR / f'representations_{target_attribute}_v{FEATURES_VERSION}.npz'
 
     if not Path(representations_file).is_file():
         representations, labels = prepare_data(ROOT_DIR, target_attribute)
@@ -0,0 +1,22 @@
+import numpy as np
+from sklearn.datasets import make_classification
+
+from ecoacoustics.data_analysis import run_random_forest
+
+
+def test_run_random_forest():
+    n_classes = 3
+    representations, labels = make_classification(
+        n_samples=150, n_features=16, n_informative=8, n_classes=n_classes, random_state=0
+    )
+
+    avg_f1, avg_accuracy, cm = run_random_forest(representations, labels, n_folds=3)
+
+    assert 0.0 <= avg_f1 <= 1.0
+    assert 0.0 <= avg_accuracy <= 1.0
+    assert cm.shape == (n_classes, n_classes)
+    assert np.isclose(cm.sum(), 1.0)
+
+    # Micro-averaged F1 equals accuracy for single-label multiclass data, and the forest should beat chance.
+    assert np.isclose(avg_f1, avg_accuracy)
+    assert avg_accuracy > 1 / n_classes
@@ -0,0 +1,27 @@
+import torch
+
+from ecoacoustics.data_processing_vggish import average_sample_representations, make_specgram_transform
+
+
+def test_average_sample_representations():
+    batch_size = 3
+    # Give example j of sample i the value 100 * i + j, so each sample's mean is 100 * i + 29.5.
+    values = (100 * torch.arange(batch_size)[:, None] + torch.arange(60)[None, :]).reshape(-1, 1).float()
+    rep = values.expand(batch_size * 60, 128)
+
+    averaged = average_sample_representations(rep, batch_size)
+
+    assert averaged.shape == (batch_size, 128)
+    expected = (100 * torch.arange(batch_size) + 29.5)[:, None].expand(batch_size, 128)
+    assert torch.allclose(averaged, expected)
+
+
+def test_specgram_transform_frames_into_vggish_examples():
+    resample_rate = 16_000
+    specgram_tform, specgram_segment_len = make_specgram_transform(resample_rate)
+    waveform = torch.zeros(1, int(specgram_segment_len * resample_rate))
+
+    specgram = specgram_tform(waveform)
+
+    assert specgram.shape == (1, 96 * 60, 64)
+    assert specgram.is_contiguous()